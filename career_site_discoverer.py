@@ -1,11 +1,40 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import DuckDuckGoSearchException
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+import random
+import re
+import shelve
+import threading
 import time
 import logging
 from urllib.parse import urlparse, urljoin
+from urllib.robotparser import RobotFileParser
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def new_session(pool_size: int = 20) -> requests.Session:
+    """
+    Creates a requests.Session configured for discovery (user agent, retries, connection pool).
+    Callers that make many find_career_page_url calls can create one and pass it in as `session`.
+    """
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    })
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+# Shared session so every search query reuses pooled TCP/TLS connections
+# instead of opening a fresh one per request. Used when no session is passed in.
+_session = new_session()
+
+@functools.lru_cache(maxsize=4096)
 def is_valid_url(url: str) -> bool:
     """Checks if a string is a syntactically valid URL."""
     try:
@@ -14,6 +43,7 @@ def is_valid_url(url: str) -> bool:
     except ValueError:
         return False
 
+@functools.lru_cache(maxsize=4096)
 def get_base_domain(url: str) -> str:
     """Extracts the base domain from a URL (e.g., example.com from www.sub.example.com)."""
     try:
@@ -25,7 +55,195 @@ def get_base_domain(url: str) -> str:
     except Exception:
         return ""
 
-def find_career_page_url(company_name: str, direct_url: str | None = None) -> str | None:
+# Minimum gap (seconds) between two requests to the same host
+MIN_HOST_INTERVAL_SECONDS = 1.5
+
+# Per-host time of the most recent (or next reserved) request, for rate limiting
+_last_hit: dict[str, float] = {}
+_last_hit_lock = threading.Lock()
+
+def _wait_for_host(host: str) -> None:
+    """Sleeps just long enough to keep MIN_HOST_INTERVAL_SECONDS between requests to the same host."""
+    with _last_hit_lock:
+        now = time.monotonic()
+        wait = max(0.0, MIN_HOST_INTERVAL_SECONDS - (now - _last_hit.get(host, float('-inf'))))
+        _last_hit[host] = now + wait # Reserve the slot before releasing the lock
+    if wait:
+        time.sleep(wait)
+
+# Parsed robots.txt per host, kept for the life of the process. Keyed on host only so a
+# caller's session isn't kept alive by the cache and every run reuses earlier fetches.
+ROBOTS_CACHE_SIZE = 1024
+_robots_cache: dict[str, RobotFileParser] = {}
+_robots_cache_lock = threading.Lock()
+
+def _fetch_robots(host: str, session: requests.Session) -> RobotFileParser:
+    """Fetches and parses robots.txt for a host."""
+    parser = RobotFileParser(f"https://{host}/robots.txt")
+    try:
+        _wait_for_host(host)
+        response = session.get(parser.url, timeout=5)
+        # Same status handling as RobotFileParser.read(): 401/403 disallow everything, other 4xx
+        # allow everything, and a 5xx leaves the parser unread, so can_fetch() returns False
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif 400 <= response.status_code < 500:
+            parser.allow_all = True
+        elif response.status_code < 400:
+            parser.parse(response.text.splitlines())
+    except requests.exceptions.RequestException as e:
+        # Unlike read(), which would raise, an unreachable robots.txt doesn't block the hit
+        logging.debug(f"Could not fetch robots.txt for {host}: {e}")
+        parser.allow_all = True
+    return parser
+
+def _robots_for(host: str, session: requests.Session) -> RobotFileParser:
+    """Returns the host's parsed robots.txt, fetching it with `session` only the first time the host is seen."""
+    with _robots_cache_lock:
+        parser = _robots_cache.get(host)
+    if parser is None:
+        parser = _fetch_robots(host, session)
+        with _robots_cache_lock:
+            if host not in _robots_cache and len(_robots_cache) >= ROBOTS_CACHE_SIZE:
+                del _robots_cache[next(iter(_robots_cache))] # Evict the oldest host
+            parser = _robots_cache.setdefault(host, parser)
+    return parser
+
+def is_allowed_by_robots(url: str, session: requests.Session | None = None) -> bool:
+    """Checks the (cached) robots.txt of the URL's host to see if we may fetch the URL."""
+    host = urlparse(url).netloc
+    if not host:
+        return False
+    session = session or _session
+    return _robots_for(host, session).can_fetch(session.headers['User-Agent'], url)
+
+# Maximum random delay (seconds) before each search request. The queries for a
+# company now run concurrently, so this spreads them out a little; the actual pacing
+# is the per-host limiter below.
+SEARCH_JITTER_SECONDS = 0.5
+
+# Host the searches go to. Every query waits for its slot on this host with _wait_for_host,
+# so DuckDuckGo sees at most one request per MIN_HOST_INTERVAL_SECONDS from this process,
+# however many companies are being discovered at once.
+SEARCH_HOST = 'duckduckgo.com'
+
+# Number of search results inspected per query
+SEARCH_MAX_RESULTS = 10
+
+# Maximum number of search requests in flight across the whole process. Many companies can be
+# discovered at once, each with several queries.
+MAX_CONCURRENT_SEARCHES = 4
+_search_slots = threading.BoundedSemaphore(MAX_CONCURRENT_SEARCHES)
+
+# Path/host tokens that suggest a search result is a career page
+_CAREER_RE = re.compile(r'careers|jobs|employment|hiring')
+
+def _search_for_career_url(query: str, company_name: str, company_slug: str, likely_domains: tuple[str, ...], session: requests.Session | None = None, stop: threading.Event | None = None, ddgs: DDGS | None = None) -> str | None:
+    """
+    Runs a single search query and returns the first result that looks like the company's career page,
+    or None if the search completed without a match. Search errors are raised, not returned as None.
+    If `stop` is set before the query is sent (another query already found a match), it is skipped.
+    Pass a shared `ddgs` client to reuse its connections and pacing across queries.
+    """
+    # Use Google search (or a search engine API if configured)
+    # For this example, we use duckduckgo_search with its default backend selection: the library
+    # picks and falls back between backends itself and hands back plain result dicts, so there
+    # is no search page HTML to parse here. (The old backend="api" is deprecated and ignored.)
+    # A real production system might use Google Custom Search API or a dedicated search API.
+    logging.debug(f"Searching with query: {query}")
+
+    try:
+        time.sleep(random.uniform(0, SEARCH_JITTER_SECONDS)) # Be polite to the search engine
+        with _search_slots:
+            if stop is not None and stop.is_set():
+                return None
+            _wait_for_host(SEARCH_HOST)
+            if stop is not None and stop.is_set(): # A match may have come in while we waited
+                return None
+            results = (ddgs or DDGS()).text(query, max_results=SEARCH_MAX_RESULTS) or []
+
+        for result in results:
+            href = result.get('href')
+            if not href or not is_valid_url(href):
+                continue
+
+            # Check if the URL is likely a career page and from the correct domain
+            href_lower = href.lower()
+            if _CAREER_RE.search(href_lower):
+                # Prioritize links that are likely from the company's own domain
+                base_href_domain = get_base_domain(href)
+                # Also check if the company name itself is in the URL or domain
+                is_likely_company_domain = (
+                    any(dom in base_href_domain for dom in likely_domains)
+                    or company_slug in base_href_domain
+                    or company_slug in href_lower
+                )
+
+                if is_likely_company_domain:
+                    # Deliberate filter: a career page the site's robots.txt disallows for our user
+                    # agent isn't handed on for scraping. The host's robots.txt is fetched once per process.
+                    if not is_allowed_by_robots(href, session):
+                        logging.info(f"Skipping {href} for {company_name}: disallowed by robots.txt")
+                        continue
+                    if stop is not None:
+                        stop.set() # Queries still waiting to be sent are no longer needed
+                    return href # Return the first good one
+
+    except DuckDuckGoSearchException as e:
+        # Re-raised so the caller can tell a failed search (e.g. rate limited) from one with no match
+        logging.warning(f"Search error for {company_name} (query: {query}): {e}")
+        raise
+
+    return None
+
+class CareerSearchError(Exception):
+    """Raised when no career page was found but at least one search query failed, so the miss can't be trusted."""
+
+# On-disk cache of discovery results, shared across runs
+CAREER_CACHE_PATH = 'career_cache.db'
+CAREER_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60 # Found URLs are trusted for 30 days
+CAREER_CACHE_NEGATIVE_TTL_SECONDS = 3 * 24 * 60 * 60 # Retry companies we found nothing for after 3 days
+_cache_lock = threading.Lock() # shelve is not safe for concurrent access
+
+def _cache_key(company_name: str, direct_url: str | None) -> str:
+    return f"{company_name}|{direct_url or ''}"
+
+def get_cached_career_page_url(company_name: str, direct_url: str | None = None) -> tuple[bool, str | None]:
+    """
+    Looks up a company in the on-disk discovery cache without doing any network work.
+    Returns (True, url) for a fresh entry, where url may be None for a cached miss, and (False, None) otherwise.
+    """
+    with _cache_lock, shelve.open(CAREER_CACHE_PATH) as cache:
+        entry = cache.get(_cache_key(company_name, direct_url))
+    if entry is not None:
+        ttl = CAREER_CACHE_TTL_SECONDS if entry['url'] else CAREER_CACHE_NEGATIVE_TTL_SECONDS
+        if time.time() - entry['ts'] < ttl:
+            return True, entry['url']
+    return False, None
+
+def _disk_cached(func):
+    """Memoizes find_career_page_url results in a shelve file with a TTL, including misses (None)."""
+    @functools.wraps(func)
+    def wrapper(company_name: str, direct_url: str | None = None, session: requests.Session | None = None) -> str | None:
+        # A valid direct URL is returned without any network work, so there is nothing to cache
+        if direct_url and is_valid_url(direct_url):
+            return func(company_name, direct_url=direct_url, session=session)
+
+        found, url = get_cached_career_page_url(company_name, direct_url)
+        if found:
+            logging.info(f"Using cached career page result for {company_name}: {url}")
+            return url
+
+        # Exceptions (including CareerSearchError for a miss with failed queries) propagate before
+        # anything is stored, so errors are retried on the next run instead of cached as a miss
+        url = func(company_name, direct_url=direct_url, session=session)
+        with _cache_lock, shelve.open(CAREER_CACHE_PATH) as cache:
+            cache[_cache_key(company_name, direct_url)] = {'url': url, 'ts': time.time()}
+        return url
+    return wrapper
+
+@_disk_cached
+def find_career_page_url(company_name: str, direct_url: str | None = None, session: requests.Session | None = None) -> str | None:
     # ... (docstring and initial logging.info remain the same) ...
     logging.info(f"Attempting to find career page for company: {company_name}")
 
@@ -48,74 +266,44 @@ def find_career_page_url(company_name: str, direct_url: str | None = None) -> st
         f"{company_name} career opportunities"
     ]
 
-    # Use Google search (or a search engine API if configured)
-    # For this example, we'll simulate a basic web search with DuckDuckGo for simplicity.
-    # A real production system might use Google Custom Search API or a dedicated search API.
-    search_base_url = "https://duckduckgo.com/html/?q="
-
     # Heuristic for likely company domains
     # This is a very simple guess; real implementation might use more advanced techniques
     # e.g., company_name.com, company-name.com, companyname.com
     company_slug = company_name.lower().replace(" ", "")
-    likely_domains = [f"{company_slug}.com", f"{company_slug}.org", f"{company_slug}.net"]
+    likely_domains = (f"{company_slug}.com", f"{company_slug}.org", f"{company_slug}.net")
     # Add more variations if needed
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-
-    found_url = None
-
-    for query in search_queries:
-        full_search_url = f"{search_base_url}{requests.utils.quote(query)}"
-        logging.debug(f"Searching with query: {full_search_url}")
-
-        try:
-            response = requests.get(full_search_url, headers=headers, timeout=10)
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # DuckDuckGo's HTML structure for search results (can change!)
-            # Look for links within elements that contain search results
-            # Common selectors: .result__a, .web-result__url, etc.
-            links = soup.select('a.result__a') # Common selector for DDG result links
-
-            for link in links:
-                href = link.get('href')
-                if not href or not is_valid_url(href):
-                    continue
-
-                # Attempt to resolve relative URLs
-                if not href.startswith(('http://', 'https://')):
-                    # This part might need refinement based on how DDG renders relative links
-                    # For now, we'll assume most are absolute for simplicity.
-                    pass # If DDG gives relative links, this needs a base URL
-
-                # Check if the URL is likely a career page and from the correct domain
-                href_lower = href.lower()
-                if ('careers' in href_lower or 'jobs' in href_lower or 'employment' in href_lower or 'hiring' in href_lower):
-                    # Prioritize links that are likely from the company's own domain
-                    base_href_domain = get_base_domain(href)
-                    is_likely_company_domain = False
-                    for dom in likely_domains:
-                        if dom in base_href_domain:
-                            is_likely_company_domain = True
-                            break
-                    # Also check if the company name itself is in the URL or domain
-                    if company_name.lower().replace(" ", "") in base_href_domain or company_name.lower().replace(" ", "") in href_lower:
-                        is_likely_company_domain = True
-
-                    if is_likely_company_domain:
-                        found_url = href
-                        logging.info(f"Found potential career URL for {company_name}: {found_url}")
-                        return found_url # Return the first good one
-
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Network error during search for {company_name} (query: {query}): {e}")
-        except Exception as e:
-            logging.error(f"Unexpected error during search for {company_name} (query: {query}): {e}", exc_info=True)
-        finally:
-            time.sleep(1) # Be polite to the search engine
+    # Run the queries concurrently (within the process-wide search limit) and take whichever good
+    # URL comes back first. Once we have a match, queries that haven't been sent yet are skipped.
+    stop = threading.Event()
+    # One search client for all of this company's queries, so they share its connections and
+    # the library's own request pacing instead of each starting from a fresh client
+    ddgs = DDGS()
+    executor = ThreadPoolExecutor(max_workers=len(search_queries))
+    try:
+        futures = [
+            executor.submit(_search_for_career_url, query, company_name, company_slug, likely_domains, session, stop, ddgs)
+            for query in search_queries
+        ]
+        errors = []
+        for future in as_completed(futures):
+            try:
+                found_url = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            if found_url:
+                logging.info(f"Found potential career URL for {company_name}: {found_url}")
+                return found_url
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # A miss is only reported (and cached) when every query actually ran to completion
+    if errors:
+        raise CareerSearchError(
+            f"{len(errors)} of {len(search_queries)} searches failed for {company_name}: {errors[0]}"
+        ) from errors[0]
 
     logging.warning(f"Could not find a reliable career URL for {company_name} after all attempts.")
     return None
@@ -135,15 +323,23 @@ if __name__ == "__main__":
     ]
 
     print("\n--- Testing Career Site Discovery ---")
-    for company_data in test_companies_with_urls:
-        company_name = company_data['name']
-        direct_url_provided = company_data['direct_career_url']
-
-        # Call the function with both arguments
-        url = find_career_page_url(company_name, direct_url=direct_url_provided)
-        if url:
-            print(f"  {company_name}: {url}")
-        else:
-            print(f"  {company_name}: No URL found")
-        print("-" * 30) # Separator for readability
+    try:
+        for company_data in test_companies_with_urls:
+            company_name = company_data['name']
+            direct_url_provided = company_data['direct_career_url']
+
+            # Call the function with both arguments
+            try:
+                url = find_career_page_url(company_name, direct_url=direct_url_provided)
+            except CareerSearchError as e:
+                print(f"  {company_name}: Search failed ({e})")
+                print("-" * 30)
+                continue
+            if url:
+                print(f"  {company_name}: {url}")
+            else:
+                print(f"  {company_name}: No URL found")
+            print("-" * 30) # Separator for readability
+    finally:
+        _session.close()
     # --- End Local Testing Setup ---
\ No newline at end of file
@@ -18,7 +18,6 @@ def retrieve_companies_from_sheet(sheet_id: str, service_account_info: dict) ->
               and has keys 'name' and 'direct_career_url'.
               Returns an empty list if an error occurs or no valid data is found.
     """
-    companies_data = []
     try:
         creds = service_account.Credentials.from_service_account_info(
             service_account_info,
@@ -26,25 +25,23 @@ def retrieve_companies_from_sheet(sheet_id: str, service_account_info: dict) ->
         )
         client = gspread.authorize(creds)
         spreadsheet = client.open_by_key(sheet_id)
-        worksheet = spreadsheet.sheet1 # Assuming data is on the first sheet
 
-        all_data = worksheet.get_all_values()
+        # Only fetch columns A-B, starting below the header row.
+        # If your sheet does NOT have headers, change the range to 'A1:B'.
+        # A range without a sheet name refers to the first sheet, so this is one values request
+        # with no extra metadata round trip to look up spreadsheet.sheet1 first.
+        all_data = spreadsheet.values_get('A2:B').get('values', [])
 
-        # Assuming the first row is headers, we'll skip it for data processing
-        # If your sheet does NOT have headers, remove or adjust this slicing.
-        data_rows = all_data[1:] # Skip header row
-
-        for i, row in enumerate(data_rows):
-            if len(row) >= 2 and row[0].strip():
-                company_name = row[0].strip()
-                direct_url = row[1].strip() if len(row[1].strip()) > 0 else None # Store empty strings as None
-
-                companies_data.append({
-                    'name': company_name,
-                    'direct_career_url': direct_url
-                })
-            else:
-                logging.warning(f"Skipping row {i+2} (including header) due to insufficient data or empty company name: {row}")
+        # The API trims trailing empty cells, so rows without a URL come back with one column.
+        # Empty strings are stored as None.
+        companies_data = [
+            {
+                'name': row[0].strip(),
+                'direct_career_url': (row[1].strip() or None) if len(row) > 1 else None
+            }
+            for row in all_data
+            if row and row[0].strip()
+        ]
 
         logging.info(f"Successfully retrieved {len(companies_data)} valid company entries from sheet ID: {sheet_id}")
         return companies_data
@@ -1,14 +1,15 @@
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import ahocorasick
+import functools
+from selectolax.lexbor import LexborHTMLParser
 import json
+import orjson
 import re
 import os
 import logging # Import logging
-import time
-import asyncio # Import asyncio for potential future async support
+import asyncio # Import asyncio for concurrent scraping
 from playwright.async_api import async_playwright # Import Playwright for advanced scraping
-from urllib.parse import urljoin
-import requests.compat
+from urllib.parse import urljoin, urlparse, urlsplit, urlunparse
 
 # Import the function from your company_data_retriever.py
 from company_data_retriever import retrieve_companies_from_sheet
@@ -32,14 +33,82 @@ excluded_keywords = ["cookie", "privacy", "help", "careers", "about", "blog",
                      "contact", "junior", "associate", "intern", "entry-level", "graphic design",
                     "visual design", "marketing design", "developer", "engineer", "frontend",
                     "backend", "sales"]
-# --- END GLOBAL DEFINITIONS ---
-
 
-# Global set to store found job listing IDs across all scrapes
-global_found_listings_ids = set()
+# Precompiled once so the per-element loop doesn't go through re's pattern cache.
+_TITLE_CLEAN_RE = re.compile(r'(work_outlineJobs|person_outline|JobsJobs|helpHelpopen_in_new|open_in_new)', re.IGNORECASE)
+_WS_RE = re.compile(r'\s+')
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+def clean_title(title):
+    """Removes icon-font noise, collapses whitespace runs, trims separators and drops a doubled first word."""
+    title = _WS_RE.sub(' ', _TITLE_CLEAN_RE.sub('', title)).strip(' :-')
+    # Only the first two words matter, so don't split the whole title
+    parts = title.split(' ', 2)
+    if len(parts) >= 2 and parts[0].lower() == parts[1].lower():
+        title = title[len(parts[0]) + 1:]
+    return title
+
+# Query parameters that only track where a click came from; they don't change the posting
+_TRACKING_PARAM_PREFIXES = ('utm_', 'src=', 'ref=')
+
+@functools.lru_cache(maxsize=4096)
+def _canon(url):
+    """Canonical form of a job URL for deduplication: tracking parameters and fragment removed."""
+    parsed = urlparse(url)
+    query = '&'.join(kv for kv in parsed.query.split('&') if kv and not kv.startswith(_TRACKING_PARAM_PREFIXES))
+    return urlunparse(parsed._replace(query=query, fragment=''))
+
+# URL tokens that mark a bare-domain link as job-related
+_JOB_PATH_RE = re.compile(r'job|career|opening|position|listing', re.IGNORECASE) # 'job' also covers 'viewjob'
+
+def _absolute_url(href, base_url):
+    """Resolves href against base_url. Returns the URL and its urlsplit() parts, splitting only once for absolute links."""
+    parts = urlsplit(href)
+    if not parts.scheme:
+        href = urljoin(base_url, href)
+        parts = urlsplit(href)
+    return href, parts
+
+def _is_bare_non_job_url(href, parts):
+    """True for links with no path (just a domain) that don't mention jobs anywhere in the URL."""
+    return not parts.path.strip('/') and _JOB_PATH_RE.search(href) is None
+
+# Labels stored on each keyword in the automaton; a keyword in both lists carries both bits
+_INCLUDE = 1
+_EXCLUDE = 2
+
+def _build_keyword_automaton():
+    """Builds one Aho-Corasick automaton over the (lowercased) job and excluded keywords, tagged with _INCLUDE/_EXCLUDE."""
+    labels = {}
+    for keyword in job_keywords:
+        labels[keyword.lower()] = labels.get(keyword.lower(), 0) | _INCLUDE
+    for keyword in excluded_keywords:
+        labels[keyword.lower()] = labels.get(keyword.lower(), 0) | _EXCLUDE
+    automaton = ahocorasick.Automaton()
+    for keyword, label in labels.items():
+        automaton.add_word(keyword, label)
+    automaton.make_automaton()
+    return automaton
+
+# Single matcher for both keyword filters: one scan of the title instead of one per keyword
+_KEYWORD_AC = _build_keyword_automaton()
+
+def _title_matches_keywords(title_lower):
+    """
+    True if the title contains a job keyword and no excluded keyword, in a single pass.
+    Stops at the first excluded hit, which is the common case for nav/footer links.
+    """
+    has_include = False
+    for _, label in _KEYWORD_AC.iter(title_lower):
+        if label & _EXCLUDE:
+            return False
+        if label & _INCLUDE:
+            has_include = True
+    return has_include
+# --- END GLOBAL DEFINITIONS ---
 
 # Global list of selectors for Playwright
-css_selectors_playwright = [
+company_selectors_playwright = [
     # Specific selectors based on detailed analysis
     'li.rc-accordion-item h3 a', # Apple
     'li.inner-grid h3.text-size-4 a', # Airbnb
@@ -53,7 +122,9 @@ css_selectors_playwright = [
     'a.career-role-card', # Webflow
     'a[data-qa="job-card-title"]', # Adobe (common for some enterprise sites)
     'div.job-info a.job-title', # Amazon (common, verify)
+]
 
+css_selectors_playwright = company_selectors_playwright + [
     # General selectors that often work on dynamic sites too
     'a.job-link',
     'a.jobTitle-link',
@@ -72,9 +143,21 @@ css_selectors_playwright = [
 ]
 
 
+# All Playwright selectors as one selector group, used to parse the rendered page
+UNION_SELECTOR_PLAYWRIGHT = ",".join(css_selectors_playwright)
+
+# Only the company-specific selectors are waited on: the general ones (h2 a, a[href*="/careers/"], ...)
+# also match site navigation, which is there as soon as the DOM loads, long before client-rendered listings.
+COMPANY_SELECTOR_PLAYWRIGHT = ",".join(company_selectors_playwright)
+
+# Bounded networkidle wait for pages where none of the company-specific selectors show up
+GENERIC_NETWORKIDLE_TIMEOUT_MS = 10000
+
+
 # --- Global Set for Deduplication across all scraped listings ---
 # This will be initialized in main and passed or accessed by functions.
-global_found_listings_ids = set()
+# Keys are canonical listing URLs (see _canon), or the title for listings without a link.
+global_seen_urls: set[str] = set()
 
 # --- Companies that require Playwright for JavaScript rendering ---
 # Add or remove companies from this list based on scraping success.
@@ -84,366 +167,544 @@ companies_requiring_playwright = [
     "Adobe", "Apple", "Amazon", "Dropbox", "Webflow", "Canva", "GoodRx",
     "Walmart" 
 ]
+# Case-folded for O(1), case-insensitive lookups against names as typed in the Google Sheet
+_PW_COMPANIES = frozenset(c.casefold() for c in companies_requiring_playwright)
+
+# CSS selectors for static sites. Focus on common patterns.
+# Avoid Playwright-specific selectors here, or ensure they also work statically.
+css_selectors_static = [
+    'a.job-link', # General link with job-link class
+    'a.jobTitle-link', # Common Workday selector
+    'a[data-ph-at-id="job-list-item-title"]', # Workday common attribute
+    'a[data-automation-id="jobTitle"]', # Another Workday common attribute
+    'li.job-result-card a', # Common card pattern with link
+    'div.job-listing__item a', # Div containing a link
+    'h3 a', # h3 with nested link
+    'h2 a', # h2 with nested link
+    '.job-card a', # Job card containing a link
+    '.job-item a', # Job item containing a link
+    '.opening-title a', # Specific title with a link
+    'a[href*="/job/"]', 'a[href*="/jobs/"]', 'a[href*="/careers/"]', # Links containing job/jobs/careers
+    'a[data-qa="job-link"]', # Data attribute link
+    # For Greenhouse/Lever/Workday, these might work if they redirect directly:
+    'a[href*="boards.greenhouse.io/"], a[href*="jobs.lever.co/"], a[href*="myworkdayjobs.com/"]',
+    # Example for companies that might work statically (confirm if dynamic or static):
+    # 'li.rc-accordion-item h3 a', # Apple (might be static, but Playwright handles it better)
+    # 'h3.QJPWVE', # Google (definitely dynamic, remove if still here for requests)
+]
+
+# All static selectors joined into a single selector group, so each page is walked once
+UNION_SELECTOR_STATIC = ",".join(css_selectors_static)
+
+# Default request headers for every scrape, shared by the aiohttp session and Playwright contexts
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
+}
+
+# Maximum number of static (aiohttp) scrapes in flight at once
+MAX_CONCURRENT_STATIC_SCRAPES = 10
+
+# Maximum number of Playwright pages open at once (each one renders a full site)
+MAX_CONCURRENT_PLAYWRIGHT_SCRAPES = 6
+
+# Set PLAYWRIGHT_DEBUG=1 to watch the scrape: the browser runs headed with a 500ms pause
+# between actions. Production runs are headless with no slow-down.
+PLAYWRIGHT_DEBUG = os.environ.get('PLAYWRIGHT_DEBUG') == '1'
+
+# Playwright request types that never carry job titles or links; they are aborted before download
+_BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+# Size of the shared aiohttp connection pool
+MAX_HTTP_CONNECTIONS = 64
+
+# Static fetches are retried on connection errors, timeouts and these statuses,
+# waiting STATIC_RETRY_BACKOFF_SECONDS * 2**attempt between attempts.
+STATIC_FETCH_RETRIES = 2
+STATIC_RETRY_BACKOFF_SECONDS = 0.5
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Only the first MAX_PAGE_BYTES of a career page are parsed; pages that announce a
+# Content-Length above MAX_CONTENT_LENGTH are not downloaded at all.
+MAX_PAGE_BYTES = 2_000_000
+MAX_CONTENT_LENGTH = 5_000_000
+
+# One JSON object per line, one line per company, written as each scrape completes
+OUTPUT_FILENAME = 'scraped_job_listings.jsonl'
+
+async def _read_capped(response, limit):
+    """Reads at most `limit` bytes of the response body, leaving the rest unread."""
+    chunks = []
+    size = 0
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= limit:
+            break
+    return b''.join(chunks)[:limit]
+
+async def _get_with_retries(session, url):
+    """GETs url with exponential backoff on transient failures. The caller must release the response."""
+    for attempt in range(STATIC_FETCH_RETRIES + 1):
+        last_attempt = attempt == STATIC_FETCH_RETRIES
+        try:
+            response = await session.get(url)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if last_attempt:
+                raise
+            logging.debug(f"  Retrying {url} after {e!r}")
+        else:
+            if last_attempt or response.status not in _RETRY_STATUSES:
+                return response
+            logging.debug(f"  Retrying {url} after HTTP {response.status}")
+            response.release()
+        await asyncio.sleep(STATIC_RETRY_BACKOFF_SECONDS * 2 ** attempt)
 
-def scrape_company_jobs(company_url, company_name):
+def _is_html_response(response):
     """
-    Scrapes job listings from a given company's career page URL using requests (for static content).
-    This function should be used for sites that render content directly in HTML (not heavily JS-loaded).
+    True if an HTTP/navigation response is an HTML page. Works for both aiohttp and Playwright
+    responses; a missing response (e.g. same-document navigation) is given the benefit of the doubt.
     """
-    try:
-        logging.info(f"  Attempting to scrape (requests): {company_url}")
+    if response is None:
+        return True
+    return 'html' in response.headers.get('content-type', '').lower()
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36'
-        }
+def _select_static_job_elements(html):
+    """Parses a static page and returns the nodes matching the static selectors. Runs in a worker thread."""
+    return LexborHTMLParser(html).css(UNION_SELECTOR_STATIC)
 
-        response = requests.get(company_url, timeout=15, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        listings = []
-        # CSS selectors for static sites. Focus on common patterns.
-        # Avoid Playwright-specific selectors here, or ensure they also work statically.
-        css_selectors_static = [
-            'a.job-link', # General link with job-link class
-            'a.jobTitle-link', # Common Workday selector
-            'a[data-ph-at-id="job-list-item-title"]', # Workday common attribute
-            'a[data-automation-id="jobTitle"]', # Another Workday common attribute
-            'li.job-result-card a', # Common card pattern with link
-            'div.job-listing__item a', # Div containing a link
-            'h3 a', # h3 with nested link
-            'h2 a', # h2 with nested link
-            '.job-card a', # Job card containing a link
-            '.job-item a', # Job item containing a link
-            '.opening-title a', # Specific title with a link
-            'a[href*="/job/"]', 'a[href*="/jobs/"]', 'a[href*="/careers/"]', # Links containing job/jobs/careers
-            'a[data-qa="job-link"]', # Data attribute link
-            # For Greenhouse/Lever/Workday, these might work if they redirect directly:
-            'a[href*="boards.greenhouse.io/"], a[href*="jobs.lever.co/"], a[href*="myworkdayjobs.com/"]',
-            # Example for companies that might work statically (confirm if dynamic or static):
-            # 'li.rc-accordion-item h3 a', # Apple (might be static, but Playwright handles it better)
-            # 'h3.QJPWVE', # Google (definitely dynamic, remove if still here for requests)
-        ]
-
-        potential_job_elements = []
-        for selector in css_selectors_static:
+async def scrape_company_jobs(session, company_url, company_name):
+    """
+    Scrapes job listings from a given company's career page URL using aiohttp (for static content).
+    This function should be used for sites that render content directly in HTML (not heavily JS-loaded).
+    The shared aiohttp.ClientSession is created in main() and reused for every company.
+    """
+    try:
+        logging.info(f"  Attempting to scrape (aiohttp): {company_url}")
+
+        async with await _get_with_retries(session, company_url) as response:
+            response.raise_for_status()
+
+            if not _is_html_response(response):
+                logging.warning(f"  Skipping {company_name}: {company_url} is not an HTML page ({response.headers.get('content-type', 'no content type')})")
+                return {"url": company_url, "listings": [], "error": "not html"}
+
+            if response.content_length is not None and response.content_length > MAX_CONTENT_LENGTH:
+                logging.warning(f"  Skipping {company_name}: page is {response.content_length} bytes (limit {MAX_CONTENT_LENGTH})")
+                return {"url": company_url, "listings": [], "error": f"Page too large: {response.content_length} bytes"}
+
+            html = await _read_capped(response, MAX_PAGE_BYTES)
+            encoding = response.charset
+        # The response is released here; only the capped body bytes are kept. The lexbor parser
+        # reads bytes as UTF-8, so UTF-8 pages (the usual case) are handed over as-is rather than
+        # decoded into a second full-size str. Without a charset header the page's <meta charset>
+        # decides; anything else is decoded first.
+        if not encoding:
+            meta = _META_CHARSET_RE.search(html, 0, 2048)
+            encoding = meta.group(1).decode('ascii') if meta else 'utf-8'
+        if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
             try:
-                # Use find_all here as select might return duplicates if selectors overlap
-                potential_job_elements.extend(soup.select(selector))
-            except Exception as e:
-                logging.debug(f"  Selector '{selector}' failed for {company_name} (requests): {e}")
-                pass
+                html = html.decode(encoding, errors='replace')
+            except LookupError:
+                logging.debug(f"  Unknown charset {encoding!r} for {company_name}; parsing as UTF-8")
 
-        # Use global_found_listings_ids for deduplication
-        current_processed_urls = set() # For deduplication within this run
+        listings = []
+        try:
+            # One pass over the DOM for all static selectors. Parsing happens in the default
+            # thread pool so a large page doesn't stall the other downloads on the event loop.
+            potential_job_elements = await asyncio.to_thread(_select_static_job_elements, html)
+        except Exception as e:
+            logging.debug(f"  Static selector union failed for {company_name} (aiohttp): {e}")
+            potential_job_elements = []
+        del html # The parser holds its own copy of the document
 
+        # Use global_seen_urls for deduplication, both within this page and across companies
         for element in potential_job_elements:
-            title = element.get_text(strip=True)
-            href = element.get('href')
+            attributes = element.attributes
+            # ATS job links usually carry the title in aria-label/title; only walk the
+            # element's descendants for text when neither attribute is set.
+            title = attributes.get('aria-label') or attributes.get('title') or element.text(strip=True)
+            href = attributes.get('href')
 
             if not title or not href:
                 continue
 
             # Standardizing title and URL
-            title = re.sub(r'(work_outlineJobs|person_outline|JobsJobs|helpHelpopen_in_new|open_in_new)', '', title, flags=re.IGNORECASE).strip()
-            title_parts = title.split()
-            if len(title_parts) >= 2 and title_parts[0].lower() == title_parts[1].lower():
-                title = ' '.join(title_parts[1:])
-            title = title.strip(':- ').replace('  ', ' ')
-
-            if not href.startswith('http'):
-                href = urljoin(company_url, href)
-
-            # Deduplicate globally
-            job_id = f"{title}-{href}" # Simple unique ID for now
-            if job_id in global_found_listings_ids or href in current_processed_urls:
-                continue
+            title = clean_title(title)
 
-            title_lower = title.lower()
-            if not any(keyword in title_lower for keyword in job_keywords):
+            try:
+                href, href_parts = _absolute_url(href, company_url)
+                if href_parts.scheme not in ('http', 'https'): # mailto:, javascript:, tel: ...
+                    continue
+
+                # Deduplicate globally
+                job_id = _canon(href) # The URL alone identifies a posting
+            except ValueError: # Malformed link (e.g. a broken IPv6 host); skip it, not the whole page
+                continue
+            if job_id in global_seen_urls:
                 continue
 
-            if any(ex_keyword in title_lower for ex_keyword in excluded_keywords):
+            title_lower = title.lower()
+            if not _title_matches_keywords(title_lower):
                 continue
 
             # Basic URL filtering
-            if len(href.strip('/').split('/')) < 4 and not any(k in href for k in ['job', 'career', 'opening', 'position', 'viewjob']):
+            if _is_bare_non_job_url(href, href_parts):
                 continue
 
             listings.append({"title": title, "url": href})
-            global_found_listings_ids.add(job_id) # Add to global set
-            current_processed_urls.add(href)
+            global_seen_urls.add(job_id) # Add to global set
 
-        logging.info(f"  Found {len(listings)} potential listings for {company_name} (requests)")
+        logging.info(f"  Found {len(listings)} potential listings for {company_name} (aiohttp)")
         return {"url": company_url, "listings": listings}
 
-    except requests.exceptions.RequestException as e:
-        logging.error(f"  Requests error for {company_name} ({company_url}): {e}")
-        return {"url": company_url, "listings": [], "error": str(e)}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logging.error(f"  HTTP error for {company_name} ({company_url}): {e!r}")
+        return {"url": company_url, "listings": [], "error": str(e) or repr(e)}
     except Exception as e:
         logging.error(f"  An unexpected error occurred for {company_name} ({company_url}): {e}", exc_info=True)
         return {"url": company_url, "listings": [], "error": str(e)}
     
 
-# Your scrape_company_jobs_with_playwright function starts here
-async def scrape_company_jobs_with_playwright(company_url, company_name):
-    """
-    Scrapes job listings from a given company's career page URL using Playwright (for JS-loaded content).
-    Each company now gets its own dedicated block for URL navigation, waiting, and extraction.
-    """
-    browser = None
+# Selectors for the companies with their own Playwright scraper
+GOOGLE_NEXT_BUTTON_SELECTOR = 'a[aria-label="Go to next page"]'
+GOOGLE_JOB_ITEM_SELECTOR = 'li.lLd3Je'
+GOOGLE_TITLE_SELECTOR = 'h3.QJPWVe'
+GOOGLE_LINK_SELECTOR = 'a[jsname="hSRGPd"]'
+
+SERVICENOW_MAIN_CONTAINER_SELECTOR = 'div#js-job-search-results'
+SERVICENOW_JOB_ITEM_SELECTOR = 'div.card.card-job' # Corrected selector based on your feedback
+SERVICENOW_TITLE_SELECTOR = 'h2.card-title' # Assuming this class is correct for the h2 within the job card
+SERVICENOW_LINK_SELECTOR = 'a.js-view-job' # Assuming this class is correct for the link within the job card
+
+async def _scrape_google(page, company_url, company_name):
+    """Paginates through Google's job results, extracting each page's items in the browser."""
+    listings = []
+    logging.info(f"    Playwright: Starting Google-specific scraping for {company_url}")
+    page_count = 0
+    max_pages = 45 # Safety limit
+
+    # Google: Initial navigation and wait for specific job items
+    response = await page.goto(company_url, wait_until='domcontentloaded', timeout=60000)
+    if not _is_html_response(response):
+        logging.warning(f"  Skipping {company_name}: {company_url} is not an HTML page ({response.headers.get('content-type', 'no content type')})")
+        return {"url": company_url, "listings": [], "error": "not html"}
     try:
-        logging.info(f"  Attempting to scrape (Playwright): {company_url}")
-        async with async_playwright() as p:
-            # Set headless=False for debugging, True for production
-            browser = await p.chromium.launch(headless=True, slow_mo=500)
-            page = await browser.new_page()
-
-            listings = []
-            current_processed_urls = set() # For deduplication within this run
-
-            # --- Company-Specific Logic Dispatch ---
-
-            if company_name == "Google":
-                logging.info(f"    Playwright: Starting Google-specific scraping for {company_url}")
-                page_count = 0
-                max_pages = 45 # Safety limit
-                google_next_button_selector = 'a[aria-label="Go to next page"]'
-                google_job_item_selector = 'li.lLd3Je'
-                google_title_selector = 'h3.QJPWVe'
-                google_link_selector = 'a[jsname="hSRGPd"]'
-
-                # Google: Initial navigation and wait for specific job items
-                await page.goto(company_url, wait_until='domcontentloaded', timeout=60000)
-                try:
-                    logging.info(f"    Playwright: Waiting for Google job items '{google_job_item_selector}' (timeout: 30.0s)...")
-                    await page.wait_for_selector(google_job_item_selector, timeout=30000)
-                    await page.wait_for_load_state('networkidle', timeout=30000)
-                    logging.info("      Playwright: Google initial job list loaded.")
-                except Exception as e:
-                    logging.warning(f"      Playwright: Timeout waiting for Google initial job list: {e}. Proceeding but may miss initial jobs.")
-
-                while page_count < max_pages:
-                    page_count += 1
-                    logging.info(f"    Playwright: Scraping Google page {page_count}...")
-
-                    # Re-get content and re-parse soup for the current page inside the loop
-                    content = await page.content()
-                    soup = BeautifulSoup(content, 'html.parser')
-
-                    job_list_items = soup.select(google_job_item_selector)
-                    if not job_list_items and page_count > 1:
-                        logging.info("    Playwright: No more job listings found on current Google page. Exiting pagination.")
-                        break
-
-                    current_page_new_listings = 0
-                    for element in job_list_items:
-                        title_element = element.select_one(google_title_selector)
-                        link_element = element.select_one(google_link_selector)
-
-                        title = title_element.get_text(strip=True) if title_element else None
-                        link = link_element.get('href') if link_element else None
-
-                        if not title or not link:
-                            continue
-
-                        if not link.startswith('http'):
-                            link = urljoin(company_url, link)
-
-                        job_id = f"{title}-{link}"
-                        if job_id in global_found_listings_ids or link in current_processed_urls:
-                            continue
-
-                        title_lower = title.lower()
-                        if not any(keyword in title_lower for keyword in job_keywords):
-                            continue
-                        if any(ex_keyword in title_lower for ex_keyword in excluded_keywords):
-                            continue
-                        if len(link.strip('/').split('/')) < 4 and not any(k in link for k in ['job', 'career', 'opening', 'position', 'viewjob', 'listing']):
-                            continue
-
-                        listings.append({"title": title, "url": link})
-                        global_found_listings_ids.add(job_id)
-                        current_processed_urls.add(link)
-                        current_page_new_listings += 1
-
-                    logging.info(f"    Playwright: Found {current_page_new_listings} new listings on Google page {page_count}.")
-
-                    try:
-                        await page.wait_for_selector(google_next_button_selector, state='visible', timeout=5000)
-                        next_button = await page.query_selector(google_next_button_selector)
-
-                        if next_button and await next_button.is_enabled():
-                            logging.info(f"    Playwright: Clicking 'Next Page' button for Google page {page_count}...")
-                            await next_button.click()
-                            await page.wait_for_load_state('domcontentloaded', timeout=15000)
-                            await page.wait_for_timeout(500)
-                        else:
-                            logging.info("    Playwright: 'Next Page' button not found or not enabled. End of Google results.")
-                            break
-                    except Exception as e:
-                        logging.info(f"    Playwright: Error finding/clicking 'Next Page' button for Google: {e}. Assuming end of results.")
-                        break
-
-                logging.info(f"  Found {len(listings)} total potential listings for {company_name} (Playwright)")
-                return {"url": company_url, "listings": listings, "error": None}
-
-            elif company_name == "ServiceNow":
-                logging.info(f"    Playwright: Starting ServiceNow-specific scraping for {company_url}")
-                service_now_main_container_selector = 'div#js-job-search-results'
-                # --- UPDATED SELECTOR HERE ---
-                service_now_job_item_selector = 'div.card.card-job' # Corrected selector based on your feedback
-                service_now_title_selector = 'h2.card-title' # Assuming this class is correct for the h2 within the job card
-                service_now_link_selector = 'a.js-view-job' # Assuming this class is correct for the link within the job card
-
-                # ServiceNow: Initial navigation and wait for main job container
-                await page.goto(company_url, wait_until='domcontentloaded', timeout=30000)
-                try:
-                    logging.info(f"    Playwright: Waiting for ServiceNow main container '{service_now_main_container_selector}' (timeout: 45.0s)...")
-                    await page.wait_for_selector(service_now_main_container_selector, timeout=45000) # Increased timeout
-                    await page.wait_for_load_state('networkidle', timeout=45000) # Keep for now, but note it might time out
-                    logging.info(f"      Playwright: ServiceNow main container '{service_now_main_container_selector}' found, network idle state reached.")
-                except Exception as e:
-                    logging.warning(f"      Playwright: Timeout waiting for ServiceNow job elements or network idle: {e}. Attempting to proceed without full load confirmation.")
-
-                content = await page.content()
-                soup = BeautifulSoup(content, 'html.parser')
-
-                # Extract jobs from the ServiceNow page
-                job_items = soup.select(service_now_job_item_selector) # Select all individual job containers
-                if not job_items:
-                    logging.warning(f"    Playwright: No job items found using selector '{service_now_job_item_selector}' for ServiceNow. Please double-check this selector and the inner title/link selectors!") # Added a more emphatic warning
-                else:
-                    logging.info(f"    Playwright: Found {len(job_items)} job item containers using selector '{service_now_job_item_selector}'.")
-
-
-                for item in job_items:
-                    title_element = item.select_one(service_now_title_selector) # Find title within the item
-                    link_element = item.select_one(service_now_link_selector) # Find link within the item
-
-                    title = title_element.get_text(strip=True) if title_element else None
-                    link = link_element.get('href') if link_element else None
-
-                    if not title or not link:
-                        # Log if a title or link is missing within a found job item
-                        logging.debug(f"      Playwright: Skipping job item due to missing title or link. Item HTML (title selector '{service_now_title_selector}', link selector '{service_now_link_selector}'): {item.prettify()}")
-                        continue
+        logging.info(f"    Playwright: Waiting for Google job items '{GOOGLE_JOB_ITEM_SELECTOR}' (timeout: 15.0s)...")
+        await page.wait_for_selector(GOOGLE_JOB_ITEM_SELECTOR, timeout=15000)
+        logging.info("      Playwright: Google initial job list loaded.")
+    except Exception as e:
+        logging.warning(f"      Playwright: Timeout waiting for Google initial job list: {e}. Proceeding but may miss initial jobs.")
+
+    while page_count < max_pages:
+        page_count += 1
+        logging.info(f"    Playwright: Scraping Google page {page_count}...")
+
+        # Pull (title, href) pairs for every job item in one round trip instead of
+        # serializing the whole DOM with page.content() and re-parsing it each page
+        job_list_items = await page.eval_on_selector_all(
+            GOOGLE_JOB_ITEM_SELECTOR,
+            """(items, [titleSel, linkSel]) => items.map(item => {
+                const titleEl = item.querySelector(titleSel);
+                const linkEl = item.querySelector(linkSel);
+                return [titleEl ? titleEl.textContent.trim() : null, linkEl ? linkEl.getAttribute('href') : null];
+            })""",
+            [GOOGLE_TITLE_SELECTOR, GOOGLE_LINK_SELECTOR],
+        )
+        if not job_list_items and page_count > 1:
+            logging.info("    Playwright: No more job listings found on current Google page. Exiting pagination.")
+            break
+
+        current_page_new_listings = 0
+        for title, link in job_list_items:
+            if not title or not link:
+                continue
+
+            try:
+                link, link_parts = _absolute_url(link, company_url)
+                if link_parts.scheme not in ('http', 'https'):
+                    continue
+                job_id = _canon(link)
+            except ValueError: # Malformed link; skip this job, not the whole company
+                continue
+            if job_id in global_seen_urls:
+                continue
+
+            title_lower = title.lower()
+            if not _title_matches_keywords(title_lower):
+                continue
+            if _is_bare_non_job_url(link, link_parts):
+                continue
+
+            listings.append({"title": title, "url": link})
+            global_seen_urls.add(job_id)
+            current_page_new_listings += 1
 
-                    if not link.startswith('http'):
-                        link = urljoin(company_url, link)
+        logging.info(f"    Playwright: Found {current_page_new_listings} new listings on Google page {page_count}.")
 
-                    job_id = f"{title}-{link}" if link else title
-                    if job_id in global_found_listings_ids or (link and link in current_processed_urls):
+        try:
+            await page.wait_for_selector(GOOGLE_NEXT_BUTTON_SELECTOR, state='visible', timeout=5000)
+            next_button = await page.query_selector(GOOGLE_NEXT_BUTTON_SELECTOR)
+
+            if next_button and await next_button.is_enabled():
+                logging.info(f"    Playwright: Clicking 'Next Page' button for Google page {page_count}...")
+                previous_first = await page.eval_on_selector(GOOGLE_JOB_ITEM_SELECTOR, "el => el.innerText")
+                await next_button.click()
+                # The results list is re-rendered in place, so wait until its first item changes
+                await page.wait_for_function(
+                    "([sel, prev]) => { const el = document.querySelector(sel); return el !== null && el.innerText !== prev; }",
+                    arg=[GOOGLE_JOB_ITEM_SELECTOR, previous_first],
+                    timeout=15000,
+                )
+            else:
+                logging.info("    Playwright: 'Next Page' button not found or not enabled. End of Google results.")
+                break
+        except Exception as e:
+            logging.info(f"    Playwright: Error finding/clicking 'Next Page' button for Google: {e}. Assuming end of results.")
+            break
+
+    logging.info(f"  Found {len(listings)} total potential listings for {company_name} (Playwright)")
+    return {"url": company_url, "listings": listings, "error": None}
+
+async def _scrape_servicenow(page, company_url, company_name):
+    """Scrapes the job cards rendered into ServiceNow's search results container."""
+    listings = []
+    logging.info(f"    Playwright: Starting ServiceNow-specific scraping for {company_url}")
+
+    # ServiceNow: Initial navigation and wait for main job container
+    response = await page.goto(company_url, wait_until='domcontentloaded', timeout=30000)
+    if not _is_html_response(response):
+        logging.warning(f"  Skipping {company_name}: {company_url} is not an HTML page ({response.headers.get('content-type', 'no content type')})")
+        return {"url": company_url, "listings": [], "error": "not html"}
+    try:
+        # networkidle never settles on ServiceNow's analytics-heavy page, so wait for the job cards themselves
+        logging.info(f"    Playwright: Waiting for ServiceNow job items '{SERVICENOW_MAIN_CONTAINER_SELECTOR} {SERVICENOW_JOB_ITEM_SELECTOR}' (timeout: 15.0s)...")
+        await page.wait_for_selector(f"{SERVICENOW_MAIN_CONTAINER_SELECTOR} {SERVICENOW_JOB_ITEM_SELECTOR}", timeout=15000)
+        logging.info(f"      Playwright: ServiceNow job items found in '{SERVICENOW_MAIN_CONTAINER_SELECTOR}'.")
+    except Exception as e:
+        logging.warning(f"      Playwright: Timeout waiting for ServiceNow job elements: {e}. Attempting to proceed without full load confirmation.")
+
+    content = await page.content()
+    tree = LexborHTMLParser(content)
+
+    # Extract jobs from the ServiceNow page
+    job_items = tree.css(SERVICENOW_JOB_ITEM_SELECTOR) # Select all individual job containers
+    if not job_items:
+        logging.warning(f"    Playwright: No job items found using selector '{SERVICENOW_JOB_ITEM_SELECTOR}' for ServiceNow. Please double-check this selector and the inner title/link selectors!") # Added a more emphatic warning
+    else:
+        logging.info(f"    Playwright: Found {len(job_items)} job item containers using selector '{SERVICENOW_JOB_ITEM_SELECTOR}'.")
+
+
+    for item in job_items:
+        title_element = item.css_first(SERVICENOW_TITLE_SELECTOR) # Find title within the item
+        link_element = item.css_first(SERVICENOW_LINK_SELECTOR) # Find link within the item
+
+        title = title_element.text(strip=True) if title_element else None
+        link = link_element.attributes.get('href') if link_element else None
+
+        if not title or not link:
+            # Log if a title or link is missing within a found job item
+            logging.debug(f"      Playwright: Skipping job item due to missing title or link. Item HTML (title selector '{SERVICENOW_TITLE_SELECTOR}', link selector '{SERVICENOW_LINK_SELECTOR}'): {item.html}")
+            continue
+
+        try:
+            if not link.startswith('http'):
+                link = urljoin(company_url, link)
+            job_id = _canon(link)
+        except ValueError: # Malformed link; skip this job, not the whole company
+            continue
+        if job_id in global_seen_urls:
+            continue
+
+        # --- TEMPORARILY COMMENT OUT THIS BLOCK ---
+        # title_lower = title.lower()
+        # if not _title_matches_keywords(title_lower):
+        #     continue
+
+        # if _is_bare_non_job_url(link, urlsplit(link)):
+        #     logging.debug(f"      Playwright: Skipping job item due to short/non-job related link: {link}")
+        #     continue
+        # elif not link and len(title.split()) < 3:
+        #     logging.debug(f"      Playwright: Skipping job item due to no link and short title: {title}")
+        #     continue
+        # --- END TEMPORARY COMMENT OUT ---
+
+        listings.append({"title": title, "url": link})
+        global_seen_urls.add(job_id)
+
+    logging.info(f"  Found {len(listings)} total potential listings for {company_name} (Playwright)")
+    return {"url": company_url, "listings": listings, "error": None}
+
+async def _scrape_generic(page, company_url, company_name):
+    """Generic Playwright CSS selectors processing for all other companies."""
+    listings = []
+    company_key = company_name.casefold()
+    logging.info(f"    Playwright: Starting generic scraping for {company_url}")
+    # For generic companies, we fall back to a simple goto and wait for anything matching our selectors
+    response = await page.goto(company_url, wait_until='domcontentloaded', timeout=60000)
+    if not _is_html_response(response):
+        logging.warning(f"  Skipping {company_name}: {company_url} is not an HTML page ({response.headers.get('content-type', 'no content type')})")
+        return {"url": company_url, "listings": [], "error": "not html"}
+    try:
+        # Wait for the first job element one of the company-specific selectors can match
+        logging.info(f"    Playwright: Waiting for generic job elements (timeout: 15.0s)...")
+        await page.wait_for_selector(COMPANY_SELECTOR_PLAYWRIGHT, timeout=15000)
+        logging.info(f"      Playwright: Generic job elements rendered.")
+    except Exception as e:
+        # No known listing markup (e.g. a redesign, or a company without specific selectors):
+        # give client-side rendering a bounded chance to finish before parsing what is there
+        logging.info(f"      Playwright: No company-specific job elements for {company_name}: {e}. Waiting for network idle.")
+        try:
+            await page.wait_for_load_state('networkidle', timeout=GENERIC_NETWORKIDLE_TIMEOUT_MS)
+        except Exception as e:
+            logging.warning(f"      Playwright: Timeout waiting for generic page load for {company_name}: {e}. Proceeding.")
+
+    content = await page.content()
+    tree = LexborHTMLParser(content)
+
+    # One DOM traversal for every Playwright selector instead of one per selector
+    try:
+        elements = tree.css(UNION_SELECTOR_PLAYWRIGHT)
+    except Exception as e:
+        logging.debug(f"  Playwright selector union failed for {company_name}: {e}")
+        elements = []
+
+    seen_nodes = set() # Guards against a node being returned once per matching selector
+    for element in elements:
+        if element.mem_id in seen_nodes:
+            continue
+        seen_nodes.add(element.mem_id)
+        link = None
+        title = None
+
+        # --- Specific extraction logic for Playwright elements within generic search ---
+        element_classes = (element.attributes.get('class') or '').split()
+        if company_key == "microsoft" and "MZGzlrn8gfgSs8TZHhv2" in element_classes:
+            title = element.text(strip=True)
+            link = None
+        elif company_key == "netflix" and "position-title" in element_classes:
+            title = element.text(strip=True)
+            link = None
+        elif element.tag == 'a':
+            link = element.attributes.get('href')
+            title = element.text(strip=True)
+        else:
+            nested_link = element.css_first('a[href]')
+            if nested_link:
+                link = nested_link.attributes.get('href')
+                title = nested_link.text(strip=True)
+            else:
+                title = element.text(strip=True)
+                link = None
+
+        if title:
+            title = clean_title(title)
+
+            try:
+                if link:
+                    link, link_parts = _absolute_url(link, company_url)
+                    if link_parts.scheme not in ('http', 'https'):
                         continue
 
-                    # --- TEMPORARILY COMMENT OUT THIS BLOCK ---
-                    # title_lower = title.lower()
-                    # if not any(keyword in title_lower for keyword in job_keywords):
-                    #     continue
-                    # if any(ex_keyword in title_lower for ex_keyword in excluded_keywords):
-                    #     continue
-
-                    # if link and len(link.strip('/').split('/')) < 4 and not any(k in link for k in ['job', 'career', 'opening', 'position', 'viewjob', 'listing']):
-                    #     logging.debug(f"      Playwright: Skipping job item due to short/non-job related link: {link}")
-                    #     continue
-                    # elif not link and len(title.split()) < 3:
-                    #     logging.debug(f"      Playwright: Skipping job item due to no link and short title: {title}")
-                    #     continue
-                    # --- END TEMPORARY COMMENT OUT ---
-
-                    listings.append({"title": title, "url": link})
-                    global_found_listings_ids.add(job_id)
-                    if link:
-                        current_processed_urls.add(link)
-
-                logging.info(f"  Found {len(listings)} total potential listings for {company_name} (Playwright)")
-                return {"url": company_url, "listings": listings, "error": None}
-
-            else: # Generic Playwright CSS selectors processing for all other companies
-                logging.info(f"    Playwright: Starting generic scraping for {company_url}")
-                # For generic companies, we fall back to a simple goto and wait for body (or rely on networkidle)
-                await page.goto(company_url, wait_until='domcontentloaded', timeout=60000)
-                try:
-                    # Generic wait for body and network idle
-                    logging.info(f"    Playwright: Waiting for generic page load (body, timeout: 20.0s)...")
-                    await page.wait_for_selector('body', timeout=20000)
-                    await page.wait_for_load_state('networkidle', timeout=30000)
-                    logging.info(f"      Playwright: Generic page loaded, network idle state reached.")
-                except Exception as e:
-                    logging.warning(f"      Playwright: Timeout waiting for generic page load for {company_name}: {e}. Proceeding.")
-
-                content = await page.content()
-                soup = BeautifulSoup(content, 'html.parser')
-
-                for selector in css_selectors_playwright:
-                    try:
-                        elements = soup.select(selector)
-                        for element in elements:
-                            link = None
-                            title = None
-
-                            # --- Specific extraction logic for Playwright elements within generic search ---
-                            if company_name == "Microsoft" and "MZGzlrn8gfgSs8TZHhv2" in element.get('class', []):
-                                title = element.get_text(strip=True)
-                                link = None
-                            elif company_name == "Netflix" and "position-title" in element.get('class', []):
-                                title = element.get_text(strip=True)
-                                link = None
-                            elif element.name == 'a':
-                                link = element.get('href')
-                                title = element.get_text(strip=True)
-                            else:
-                                nested_link = element.find('a', href=True)
-                                if nested_link:
-                                    link = nested_link.get('href')
-                                    title = nested_link.get_text(strip=True)
-                                else:
-                                    title = element.get_text(strip=True)
-                                    link = None
-
-                            if title:
-                                title = re.sub(r'(work_outlineJobs|person_outline|JobsJobs|helpHelpopen_in_new|open_in_new)', '', title, flags=re.IGNORECASE).strip()
-                                title_parts = title.split()
-                                if len(title_parts) >= 2 and title_parts[0].lower() == title_parts[1].lower():
-                                    title = ' '.join(title_parts[1:])
-                                title = title.strip(':- ').replace('  ', ' ')
-
-                                if link and not link.startswith('http'):
-                                    link = urljoin(company_url, link)
-
-                                job_id = f"{title}-{link}" if link else title
-                                if job_id in global_found_listings_ids or (link and link in current_processed_urls):
-                                    continue
-
-                                title_lower = title.lower()
-                                if not any(keyword in title_lower for keyword in job_keywords):
-                                    continue
-                                if any(ex_keyword in title_lower for ex_keyword in excluded_keywords):
-                                    continue
-
-                                if link and len(link.strip('/').split('/')) < 4 and not any(k in link for k in ['job', 'career', 'opening', 'position', 'viewjob', 'listing']):
-                                    continue
-                                elif not link and len(title.split()) < 3:
-                                    continue
-
-                                listings.append({"title": title, "url": link})
-                                global_found_listings_ids.add(job_id)
-                                if link:
-                                    current_processed_urls.add(link)
-                    except Exception as e:
-                        logging.debug(f"  Selector '{selector}' failed for {company_name} (Playwright): {e}")
-                        pass
-
-                logging.info(f"  Found {len(listings)} potential listings for {company_name} (Playwright)")
-                return {"url": company_url, "listings": listings, "error": None}
+                job_id = _canon(link) if link else title
+            except ValueError: # Malformed link; skip this element, not the whole company
+                continue
+            if job_id in global_seen_urls:
+                continue
+
+            title_lower = title.lower()
+            if not _title_matches_keywords(title_lower):
+                continue
+
+            if link and _is_bare_non_job_url(link, link_parts):
+                continue
+            elif not link and len(title.split()) < 3:
+                continue
+
+            listings.append({"title": title, "url": link})
+            global_seen_urls.add(job_id)
+
+    logging.info(f"  Found {len(listings)} potential listings for {company_name} (Playwright)")
+    return {"url": company_url, "listings": listings, "error": None}
+
+async def _block_heavy_resources(route):
+    """Playwright route handler: aborts images, media, fonts and stylesheets and lets everything else through."""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+# Companies with a dedicated Playwright scraper, keyed by case-folded name. Everything else
+# uses _scrape_generic.
+SCRAPERS = {
+    "google": _scrape_google,
+    "servicenow": _scrape_servicenow,
+}
 
+async def scrape_company_jobs_with_playwright(browser, company_url, company_name):
+    """
+    Scrapes job listings from a given company's career page URL using Playwright (for JS-loaded content).
+    Companies in SCRAPERS get their own handler for URL navigation, waiting, and extraction.
+    The browser is shared across companies; each call gets its own isolated context (cookies, cache).
+    """
+    context = None
+    try:
+        logging.info(f"  Attempting to scrape (Playwright): {company_url}")
+        context = await browser.new_context(user_agent=HEADERS['User-Agent'])
+        # Registered before the first goto so no page in this context downloads them
+        await context.route("**/*", _block_heavy_resources)
+        page = await context.new_page()
+
+        # --- Company-Specific Logic Dispatch ---
+        handler = SCRAPERS.get(company_name.casefold(), _scrape_generic)
+        return await handler(page, company_url, company_name)
     except Exception as e:
         logging.error(f"  Error scraping with Playwright for {company_name} ({company_url}): {e}", exc_info=True)
         return {"url": company_url, "listings": [], "error": str(e)}
     finally:
-        if browser:
-            logging.info(f"    Playwright: Closing browser for {company_name}.")
-            await browser.close()
+        if context:
+            logging.info(f"    Playwright: Closing browser context for {company_name}.")
+            await context.close()
+
+async def bounded_scrape(sem, session, company_url, company_name):
+    """Runs scrape_company_jobs while holding a slot of the shared semaphore."""
+    async with sem:
+        return await scrape_company_jobs(session, company_url, company_name)
+
+async def bounded_playwright_scrape(sem, browser, company_url, company_name):
+    """Runs scrape_company_jobs_with_playwright while holding a slot of the Playwright semaphore."""
+    async with sem:
+        logging.info(f"    DEBUG: Current company_name being processed: '{company_name}' ")
+        return await scrape_company_jobs_with_playwright(browser, company_url, company_name)
+
+async def _scrape_and_queue(queue, scrape, company_name, career_page_url):
+    """Awaits one company's scrape and hands its output record to the writer task."""
+    try:
+        result = await scrape
+    except Exception as e:
+        logging.error(f"  Unhandled error scraping {company_name} ({career_page_url}): {e!r}")
+        result = {"url": career_page_url, "listings": [], "error": str(e) or repr(e)}
+    await queue.put({
+        "company_name": company_name,
+        "career_page_url": career_page_url,
+        "scraped_data": result # This now contains 'url' and 'listings'
+    })
+
+async def _write_results(queue, output_filename):
+    """Appends each queued record to output_filename as one JSON line until it receives None."""
+    written = 0
+    try:
+        # orjson writes UTF-8 without escaping non-ASCII, like ensure_ascii=False did
+        with open(output_filename, 'wb') as f:
+            while (record := await queue.get()) is not None:
+                f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+                f.flush()
+                written += 1
+    except Exception as e:
+        logging.error(f"Error saving results to JSONL: {e}")
+        # Keep draining so producers never block on a dead writer
+        while await queue.get() is not None:
+            pass
+    return written
 
 # --- Main execution block ---
 async def main():
@@ -494,46 +755,64 @@ async def main():
     else:
         logging.info(f"Successfully loaded {len(companies_data)} companies from Google Sheet.")
 
-    scraped_data = []
     logging.info("Starting job scraping process...\n")
 
     # Access the global set for deduplication
-    global global_found_listings_ids
-    global_found_listings_ids = set() # Reset for each run if needed
+    global global_seen_urls
+    global_seen_urls = set() # Reset for each run if needed
     #debug_companies = ["ServiceNow"] # Only scrape Google and ServiceNow for now - REMOVE THIS LINE IN PRODUCTION
+    companies_to_scrape = []
     for company in companies_data:
         # --- FIX STARTS HERE ---
         # Use the keys that retrieve_companies_from_sheet actually provides
-        company_name = company.get('name', 'Unknown Company').strip()
-        career_page_url = company.get('direct_career_url', '').strip()
+        company_name = (company.get('name') or 'Unknown Company').strip()
+        career_page_url = (company.get('direct_career_url') or '').strip()
         # --- FIX ENDS HERE ---
-     
 
         if not career_page_url:
             logging.warning(f"--- Skipping {company_name}: No Careers Page URL found in Google Sheet. ---")
             continue
 
-        logging.info(f"    DEBUG: Current company_name being processed: '{company_name}' ")
-
-        if company_name in companies_requiring_playwright:
-            result = await scrape_company_jobs_with_playwright(career_page_url, company_name)
-        else:
-            result = scrape_company_jobs(career_page_url, company_name)
-
-        scraped_data.append({
-            "company_name": company_name,
-            "career_page_url": career_page_url,
-            "scraped_data": result # This now contains 'url' and 'listings'
-        })
-        logging.info("-" * (len(company_name) + 16) + "\n")
-
-    output_filename = 'scraped_job_listings.json'
-    try:
-        with open(output_filename, 'w', encoding='utf-8') as f:
-            json.dump(scraped_data, f, indent=4, ensure_ascii=False)
-        logging.info(f"Scraping complete. Results saved to '{output_filename}'")
-    except Exception as e:
-        logging.error(f"Error saving results to JSON: {e}")
+        companies_to_scrape.append((company_name, career_page_url, company_name.casefold() in _PW_COMPANIES))
+
+    # Static and Playwright scrapes are all network-bound, so they run together in one gather.
+    # Static fetches share one aiohttp session; JS-heavy sites share one browser with a
+    # context per company. Each kind has its own semaphore to cap how much is in flight.
+    static_sem = asyncio.Semaphore(MAX_CONCURRENT_STATIC_SCRAPES)
+    playwright_sem = asyncio.Semaphore(MAX_CONCURRENT_PLAYWRIGHT_SCRAPES)
+    needs_playwright = any(use_playwright for _, _, use_playwright in companies_to_scrape)
+
+    timeout = aiohttp.ClientTimeout(total=15)
+    connector = aiohttp.TCPConnector(limit=MAX_HTTP_CONNECTIONS, keepalive_timeout=30)
+    async with aiohttp.ClientSession(timeout=timeout, headers=HEADERS, connector=connector) as session, async_playwright() as p:
+        browser = None
+        if needs_playwright:
+            browser = await p.chromium.launch(headless=not PLAYWRIGHT_DEBUG, slow_mo=500 if PLAYWRIGHT_DEBUG else 0)
+        # Each company's record is written as soon as its scrape finishes, so memory stays flat
+        # and a crash mid-run keeps everything scraped so far. A single writer task owns the file.
+        queue = asyncio.Queue()
+        writer = asyncio.create_task(_write_results(queue, OUTPUT_FILENAME))
+        try:
+            tasks = [
+                _scrape_and_queue(
+                    queue,
+                    bounded_playwright_scrape(playwright_sem, browser, url, name)
+                    if use_playwright
+                    else bounded_scrape(static_sem, session, url, name),
+                    name,
+                    url,
+                )
+                for name, url, use_playwright in companies_to_scrape
+            ]
+            await asyncio.gather(*tasks)
+        finally:
+            await queue.put(None)
+            written = await writer
+            if browser:
+                logging.info("    Playwright: Closing shared browser.")
+                await browser.close()
+
+    logging.info(f"Scraping complete. {written} results saved to '{OUTPUT_FILENAME}'")
 
 # --- Run the async main function ---
 if __name__ == "__main__":
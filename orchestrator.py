@@ -1,7 +1,15 @@
+import asyncio
+import contextlib
+import functools
+import itertools
 import json
+import orjson
 import os
 import logging
-from typing import List, Dict, Optional
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
 
 # Import your custom modules
 import company_data_retriever
@@ -9,25 +17,111 @@ import career_site_discoverer
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def run_orchestration(
-    sheet_id: str,
-    service_account_info: dict,
-    output_file: str = "discovered_career_pages.json"
-) -> List[Dict]:
+# Maximum number of companies whose career pages are being discovered at once.
+# Override with the ORCHESTRATOR_MAX_WORKERS environment variable.
+MAX_CONCURRENT_DISCOVERIES = int(os.environ.get('ORCHESTRATOR_MAX_WORKERS', '20'))
+
+# Only the first MAX_LOGGED_TRACEBACKS discovery errors are logged with a full traceback;
+# later ones get the one-line message only.
+MAX_LOGGED_TRACEBACKS = 5
+
+# Connections kept per host by the HTTP session shared by all discoveries in a run
+DISCOVERY_HTTP_POOL_SIZE = 32
+
+@functools.lru_cache(maxsize=8)
+def _load_sa(path: str, mtime: float) -> dict:
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def load_service_account(path: str) -> dict:
     """
-    Orchestrates the process of retrieving company data and discovering their career pages.
+    Loads a service account key file, parsing it only once per process. The file's mtime is
+    part of the cache key, so an updated key file is picked up on the next call.
+    """
+    return _load_sa(path, os.stat(path).st_mtime)
 
-    Args:
-        sheet_id (str): The ID of the Google Sheet containing company names and URLs.
-        service_account_info (dict): The service account credentials for Google Sheets access.
-        output_file (str): The filename to save the discovered career pages.
+@dataclass(slots=True, frozen=True)
+class DiscoveryResult:
+    """
+    Outcome of career page discovery for one sheet row. orjson serializes it as an object
+    with the same three keys the output file has always had.
+    """
+    company_name: str
+    career_page_url: Optional[str]
+    # 'SUCCESS', 'FAILED_DISCOVERY' (every search ran, none matched) or
+    # 'ERROR_DISCOVERY: <message>' (a search or lookup failed; never cached, so retried next run)
+    status: str
 
-    Returns:
-        List[Dict]: A list of dictionaries, each containing 'company_name',
-                    'career_page_url', and 'status'.
+def _discovery_entry(company_name: str, career_url: Optional[str]) -> DiscoveryResult:
+    """Builds the SUCCESS / FAILED_DISCOVERY result for a finished lookup."""
+    if career_url:
+        return DiscoveryResult(company_name=company_name, career_page_url=career_url, status='SUCCESS')
+    return DiscoveryResult(company_name=company_name, career_page_url=None, status='FAILED_DISCOVERY')
+
+def _dedup_key(company_data: Dict) -> tuple:
+    """Rows with the same key would run the exact same discovery: name (case/space-insensitive) plus direct URL."""
+    return (
+        company_data['name'].strip().casefold(),
+        (company_data.get('direct_career_url') or '').rstrip('/')
+    )
+
+def _write_checkpoint(f, entry: DiscoveryResult) -> None:
+    """Appends one result entry to the NDJSON checkpoint and flushes it to disk right away."""
+    f.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+    f.flush()
+
+async def _discover_one(company_data: Dict, executor: ThreadPoolExecutor, session: requests.Session, error_count: Iterator[int]) -> DiscoveryResult:
+    """
+    Runs the (blocking) career page discovery for one company on the discovery
+    thread pool and returns its result entry. error_count is the run's counter of
+    discovery errors, used to limit how many are logged with a traceback.
+    """
+    company_name = company_data['name']
+    direct_career_url = company_data.get('direct_career_url') # This will be None if not provided
+
+    try:
+        career_url = await asyncio.get_running_loop().run_in_executor(
+            executor,
+            functools.partial(
+                career_site_discoverer.find_career_page_url,
+                company_name,
+                direct_url=direct_career_url,
+                session=session
+            )
+        )
+    except career_site_discoverer.CareerSearchError as e:
+        # Searches failed (e.g. rate limited); the discoverer did not cache this, so the next run retries it
+        logging.warning("Career page search failed for %s: %s", company_name, e)
+        return DiscoveryResult(company_name=company_name, career_page_url=None, status=f'ERROR_DISCOVERY: {str(e)}')
+    except Exception as e:
+        # Tracebacks for the first few failures are enough to diagnose a flaky run
+        logging.error(
+            "Error discovering career page for %s: %s", company_name, e,
+            exc_info=next(error_count) < MAX_LOGGED_TRACEBACKS
+        )
+        return DiscoveryResult(company_name=company_name, career_page_url=None, status=f'ERROR_DISCOVERY: {str(e)}')
+
+    if career_url:
+        logging.info("Discovered career page for %s: %s", company_name, career_url)
+    else:
+        logging.warning("Could not discover career page for %s.", company_name)
+    return _discovery_entry(company_name, career_url)
+
+async def _discover_keyed(key: tuple, company_data: Dict, executor: ThreadPoolExecutor, session: requests.Session, error_count: Iterator[int]):
+    """_discover_one, returning the row's dedup key alongside the result so as_completed callers know which rows it answers."""
+    return key, await _discover_one(company_data, executor, session, error_count)
+
+async def _orchestrate(
+    sheet_id: str,
+    service_account_info: dict,
+    output_file: str
+) -> AsyncIterator[Tuple[int, DiscoveryResult]]:
+    """
+    Yields (row position, result) for every valid sheet row as soon as its result is known:
+    cache hits first, then discoveries in completion order. After the last row has been
+    yielded, the full results are saved to output_file in sheet order.
     """
     logging.info("Starting orchestration process...")
-    discovered_pages = []
 
     # 1. Retrieve companies from Google Sheet
     logging.info("Retrieving companies from Google Sheet...")
@@ -37,59 +131,169 @@ def run_orchestration(
 
     if not companies_from_sheet:
         logging.error("No companies retrieved from the Google Sheet. Orchestration aborted.")
-        return []
+        return
+
+    logging.info("Successfully retrieved %d companies. Discovering career pages...", len(companies_from_sheet))
+
+    # Validate every row in one pass up front and report the rejects in a single line
+    companies = [c for c in companies_from_sheet if (c.get('name') or '').strip()]
+    skipped = len(companies_from_sheet) - len(companies)
+    if skipped:
+        logging.warning("Skipping %d entries with a missing company name.", skipped)
+
+    # Rows naming the same company with the same direct URL (e.g. after merging lists) are
+    # looked up once; the first such row stands in for the others.
+    rows_by_key: Dict[tuple, List[int]] = {}
+    for position, company_data in enumerate(companies):
+        rows_by_key.setdefault(_dedup_key(company_data), []).append(position)
+    if len(rows_by_key) != len(companies):
+        logging.info("%d duplicate rows will reuse another row's result.", len(companies) - len(rows_by_key))
 
-    logging.info(f"Successfully retrieved {len(companies_from_sheet)} companies. Discovering career pages...")
+    discovered_pages: List[Optional[DiscoveryResult]] = [None] * len(companies)
 
-    # 2. Discover career pages for each company
-    for company_data in companies_from_sheet:
-        company_name = company_data.get('name')
-        direct_career_url = company_data.get('direct_career_url') # This will be None if not provided
+    def fan_out(key: tuple, result: DiscoveryResult):
+        """Records a lookup's result for every row sharing its key, each under its own spelling of the name."""
+        for position in rows_by_key[key]:
+            row_result = replace(result, company_name=companies[position]['name'])
+            discovered_pages[position] = row_result
+            yield position, row_result
 
-        if not company_name:
-            logging.warning(f"Skipping entry with missing company name: {company_data}")
+    # 2. Resolve rows with a usable direct URL inline (find_career_page_url would just return it),
+    # answer what we can from the discoverer's disk cache, then discover the rest concurrently.
+    # Neither direct URLs nor cache hits touch the thread pool.
+    resolved_results: Dict[tuple, DiscoveryResult] = {}
+    companies_to_discover = [] # (dedup key, company_data)
+    direct_count = 0
+    # Bound once instead of resolving module attributes on every row
+    is_valid_url = career_site_discoverer.is_valid_url
+    get_cached = career_site_discoverer.get_cached_career_page_url
+    append_pending = companies_to_discover.append
+    for key, positions in rows_by_key.items():
+        company_data = companies[positions[0]]
+        company_name = company_data['name']
+        direct_career_url = company_data.get('direct_career_url')
+        if direct_career_url and is_valid_url(direct_career_url):
+            resolved_results[key] = _discovery_entry(company_name, direct_career_url)
+            direct_count += 1
             continue
+        found, career_url = get_cached(company_name, direct_url=direct_career_url)
+        if found:
+            resolved_results[key] = _discovery_entry(company_name, career_url)
+        else:
+            append_pending((key, company_data))
+    logging.info(
+        "%d companies use their direct career URL, %d were answered from the discovery cache; discovering %d...",
+        direct_count, len(resolved_results) - direct_count, len(companies_to_discover)
+    )
+
+    # Every entry is also appended to an NDJSON checkpoint as soon as it is known, so a crash
+    # mid-run keeps the work done so far. The JSON array in output_file is written at the end.
+    checkpoint_file = os.path.splitext(output_file)[0] + '.ndjson'
+    with open(checkpoint_file, 'wb') as checkpoint:
+        for key, entry in resolved_results.items():
+            _write_checkpoint(checkpoint, entry)
+            for row in fan_out(key, entry):
+                yield row
 
+        # A dedicated pool rather than asyncio.to_thread's default one, so the worker count really
+        # is MAX_CONCURRENT_DISCOVERIES (the default pool is capped at min(32, CPUs + 4)).
+        # All lookups share one HTTP session, which is closed once discovery is done.
+        # The pool is not used as a context manager: its exit would block the event loop
+        # until every running lookup had finished.
+        executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DISCOVERIES)
         try:
-            career_url = career_site_discoverer.find_career_page_url(
-                company_name,
-                direct_url=direct_career_url
-            )
+            with career_site_discoverer.new_session(pool_size=DISCOVERY_HTTP_POOL_SIZE) as session:
+                # Counted per run, so every run logs tracebacks for its own first few errors
+                error_count = itertools.count()
+                tasks = [
+                    asyncio.create_task(_discover_keyed(key, company_data, executor, session, error_count))
+                    for key, company_data in companies_to_discover
+                ]
+                try:
+                    # Hand results on as lookups finish, logging progress along the way
+                    for completed, next_done in enumerate(asyncio.as_completed(tasks), start=1):
+                        key, entry = await next_done
+                        _write_checkpoint(checkpoint, entry)
+                        logging.info("Discovery progress: %d/%d companies done", completed, len(tasks))
+                        for row in fan_out(key, entry):
+                            yield row
+                finally:
+                    for task in tasks:
+                        task.cancel()
+        finally:
+            # A consumer that stops early must not leave lookups running in the background: drop the
+            # queued ones and return without waiting for the few already running to finish.
+            executor.shutdown(wait=False, cancel_futures=True)
+    logging.info("Discovery checkpoint written to %s", checkpoint_file)
 
-            if career_url:
-                logging.info(f"Discovered career page for {company_name}: {career_url}")
-                discovered_pages.append({
-                    'company_name': company_name,
-                    'career_page_url': career_url,
-                    'status': 'SUCCESS'
-                })
-            else:
-                logging.warning(f"Could not discover career page for {company_name}.")
-                discovered_pages.append({
-                    'company_name': company_name,
-                    'career_page_url': None,
-                    'status': 'FAILED_DISCOVERY'
-                })
-        except Exception as e:
-            logging.error(f"Error discovering career page for {company_name}: {e}", exc_info=True)
-            discovered_pages.append({
-                'company_name': company_name,
-                'career_page_url': None,
-                'status': f'ERROR_DISCOVERY: {str(e)}'
-            })
-
-    # 3. Save the results to a JSON file
+    # 3. Save the results to a JSON file. It is written to a temporary file and renamed into
+    # place, so a crash mid-write leaves the previous run's file intact instead of a truncated one.
     try:
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(discovered_pages, f, ensure_ascii=False, indent=4)
-        logging.info(f"Discovered career pages saved to {output_file}")
+        tmp_file = output_file + '.tmp'
+        # orjson writes UTF-8 without escaping non-ASCII, like ensure_ascii=False did
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(discovered_pages, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_file, output_file)
+        logging.info("Discovered career pages saved to %s", output_file)
     except Exception as e:
-        logging.error(f"Error saving discovered pages to {output_file}: {e}", exc_info=True)
+        logging.error("Error saving discovered pages to %s: %s", output_file, e, exc_info=True)
 
     logging.info("Orchestration process finished.")
-    return discovered_pages
 
-if __name__ == "__main__":
+async def iter_orchestration(
+    sheet_id: str,
+    service_account_info: dict,
+    output_file: str = "discovered_career_pages.json"
+) -> AsyncIterator[DiscoveryResult]:
+    """
+    Like run_orchestration_async, but yields each row's DiscoveryResult as soon as it is known
+    (cache hits first, then discoveries in completion order) so callers can start working on
+    career pages before the slowest company has been discovered. output_file is written
+    once the iterator is exhausted. Callers that may stop early should wrap the iterator
+    in contextlib.aclosing so the remaining lookups are dropped as soon as they do.
+
+    Args:
+        sheet_id (str): The ID of the Google Sheet containing company names and URLs.
+        service_account_info (dict): The service account credentials for Google Sheets access.
+        output_file (str): The filename to save the discovered career pages.
+    """
+    # aclosing so a consumer that breaks out early shuts discovery down right away, not at garbage collection
+    async with contextlib.aclosing(_orchestrate(sheet_id, service_account_info, output_file)) as rows:
+        async for _, result in rows:
+            yield result
+
+async def run_orchestration_async(
+    sheet_id: str,
+    service_account_info: dict,
+    output_file: str = "discovered_career_pages.json"
+) -> List[DiscoveryResult]:
+    """
+    Orchestrates the process of retrieving company data and discovering their career pages.
+    Discovery is network-bound, so up to MAX_CONCURRENT_DISCOVERIES companies are looked up at once
+    and progress is logged as each one finishes.
+
+    Args:
+        sheet_id (str): The ID of the Google Sheet containing company names and URLs.
+        service_account_info (dict): The service account credentials for Google Sheets access.
+        output_file (str): The filename to save the discovered career pages.
+
+    Returns:
+        List[DiscoveryResult]: One result per sheet row, in sheet order, each with
+                    'company_name', 'career_page_url', and 'status'.
+    """
+    rows = [row async for row in _orchestrate(sheet_id, service_account_info, output_file)]
+    return [result for _, result in sorted(rows, key=lambda row: row[0])]
+
+def run_orchestration(
+    sheet_id: str,
+    service_account_info: dict,
+    output_file: str = "discovered_career_pages.json"
+) -> List[DiscoveryResult]:
+    """Synchronous wrapper around run_orchestration_async for callers without an event loop."""
+    return asyncio.run(run_orchestration_async(sheet_id, service_account_info, output_file))
+
+def _main() -> None:
+    """Local testing entry point: runs the orchestration against the configured sheet and logs a summary."""
     # --- Local Testing Setup for Orchestrator ---
     LOCAL_KEY_FILE_PATH = os.path.expanduser('~/Projects/my-job-scraper-agent-key.json') # Or your actual secure path
 
@@ -97,23 +301,25 @@ if __name__ == "__main__":
     YOUR_COMPANY_SHEET_ID = "14XRmAeAyyPvJFg6ePhz8Koad3dokBC8q86wBxqtcd4Q" # <--- REPLACE THIS WITH YOUR REAL SHEET ID
 
     if not os.path.exists(LOCAL_KEY_FILE_PATH):
-        logging.error(f"Service account key file not found at: {LOCAL_KEY_FILE_PATH}")
+        logging.error("Service account key file not found at: %s", LOCAL_KEY_FILE_PATH)
         logging.info("Please update LOCAL_KEY_FILE_PATH in orchestrator.py for local testing.")
     elif YOUR_COMPANY_SHEET_ID == "YOUR_COMPANIES_GOOGLE_SHEET_ID_HERE":
         logging.warning("Please replace 'YOUR_COMPANIES_GOOGLE_SHEET_ID_HERE' with your actual Google Sheet ID in orchestrator.py for local testing.")
     else:
         try:
             logging.info("Loading service account info for orchestration.")
-            with open(LOCAL_KEY_FILE_PATH, 'r') as f:
-                sa_info = json.load(f)
+            sa_info = load_service_account(LOCAL_KEY_FILE_PATH)
 
             # Run the orchestration process
             final_results = run_orchestration(YOUR_COMPANY_SHEET_ID, sa_info)
 
-            logging.info(f"\n--- Orchestration Summary ---")
+            logging.info("\n--- Orchestration Summary ---")
             for entry in final_results:
-                logging.info(f"Company: {entry['company_name']}, URL: {entry['career_page_url'] if entry['career_page_url'] else 'N/A'}, Status: {entry['status']}")
+                logging.info("Company: %s, URL: %s, Status: %s", entry.company_name, entry.career_page_url or 'N/A', entry.status)
 
         except Exception as e:
-            logging.error(f"Error during orchestrator local testing: {e}", exc_info=True)
-    # --- End Local Testing Setup ---
\ No newline at end of file
+            logging.error("Error during orchestrator local testing: %s", e, exc_info=True)
+    # --- End Local Testing Setup ---
+
+if __name__ == "__main__":
+    _main()